@@ -1,11 +1,30 @@
 import os
 import json
 import logging
+import logging.handlers
+import argparse
+import atexit
+import pickle
+import re
+import shutil
+import subprocess
+import threading
+import time
+import queue
 import psycopg2
 import psycopg2.extras
+import psycopg2.pool
 import pyodbc
+from psycopg2 import sql as pgsql
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache, partial
 from typing import List, Dict, Any
 
+# Let the ODBC driver manager reuse SQL Server connections instead of a
+# fresh TCP+auth handshake each time (on by default, made explicit).
+pyodbc.pooling = True
+
 
 # -------------------------------------------------------------
 #  LOGGING
@@ -14,14 +33,26 @@ def setup_logging():
     if not os.path.exists("logs"):
         os.makedirs("logs", exist_ok=True)
 
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s | %(levelname)s | %(message)s",
-        handlers=[
-            logging.FileHandler("logs/migration.log"),
-            logging.StreamHandler()
-        ]
-    )
+    formatter = logging.Formatter("%(asctime)s | %(levelname)s | %(message)s")
+    handlers = [
+        logging.FileHandler("logs/migration.log"),
+        logging.StreamHandler()
+    ]
+    for h in handlers:
+        h.setFormatter(formatter)
+
+    # Handlers run on a listener thread so file/stream writes never
+    # block the copy loops; worker threads only enqueue records.
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers)
+    listener.start()
+    # Flush whatever is still queued (final status, late tracebacks)
+    # before the interpreter kills the daemon listener thread.
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
 
 setup_logging()
 
@@ -37,21 +68,38 @@ SQL = CFG["sqlserver"]
 SCHEMAS = CFG["schemas"]
 BATCH_SIZE = CFG["batch_size"]
 EXPORT_DIR = CFG["export_dir"]
+BULK_INSERT_THRESHOLD = CFG.get("bulk_insert_threshold", 1000000)
+PARTITION_THRESHOLD = CFG.get("partition_threshold", 500000)
+PARTITION_WORKERS = CFG.get("partition_workers", 4)
+PRESERVE_IDENTITY = CFG.get("preserve_identity", True)
 
 
 # -------------------------------------------------------------
 #  CONNECTION HELPERS
 # -------------------------------------------------------------
-def pg_conn():
-    conn = psycopg2.connect(
+PG_POOL = None
+
+
+def init_pg_pool(maxconn):
+    global PG_POOL
+    PG_POOL = psycopg2.pool.ThreadedConnectionPool(
+        1, maxconn,
         host=PG["host"],
         port=PG["port"],
         dbname=PG["database"],
         user=PG["user"],
         password=PG["password"],
     )
+
+
+@contextmanager
+def pooled_pg_conn():
+    conn = PG_POOL.getconn()
     conn.autocommit = True
-    return conn
+    try:
+        yield conn
+    finally:
+        PG_POOL.putconn(conn)
 
 
 def sql_conn():
@@ -65,13 +113,16 @@ def sql_conn():
         "TrustServerCertificate=yes;"
     )
     conn = pyodbc.connect(conn_str)
-    conn.autocommit = True
+    # Batches for one table share a single transaction; committing per
+    # batch would force a log flush (fsync) every executemany.
+    conn.autocommit = False
     return conn
 
 
 # -------------------------------------------------------------
 #  TYPE MAPPING
 # -------------------------------------------------------------
+@lru_cache(maxsize=4096)
 def map_pg_type(pg_type, length, precision, scale, is_serial):
     pg_type = pg_type.lower()
 
@@ -123,60 +174,72 @@ def get_tables(pg):
     return pg.fetchall()
 
 
-def get_columns(pg, schema, table):
+def get_all_columns(pg, schemas):
     pg.execute("""
-        SELECT column_name, data_type, is_nullable,
+        SELECT table_schema, table_name,
+               column_name, data_type, is_nullable,
                character_maximum_length,
                numeric_precision, numeric_scale,
                column_default
         FROM information_schema.columns
-        WHERE table_schema=%s AND table_name=%s
-        ORDER BY ordinal_position
-    """, (schema, table))
+        WHERE table_schema = ANY(%s)
+        ORDER BY table_schema, table_name, ordinal_position
+    """, (schemas,))
 
-    cols = []
+    cols = {}
     for row in pg.fetchall():
-        is_serial = row[6] and isinstance(row[6], str) and row[6].startswith("nextval")
-        cols.append({
-            "name": row[0],
-            "data_type": row[1],
-            "nullable": row[2] == "YES",
-            "length": row[3],
-            "precision": row[4],
-            "scale": row[5],
+        is_serial = row[8] and isinstance(row[8], str) and row[8].startswith("nextval")
+        cols.setdefault((row[0], row[1]), []).append({
+            "name": row[2],
+            "data_type": row[3],
+            "nullable": row[4] == "YES",
+            "length": row[5],
+            "precision": row[6],
+            "scale": row[7],
             "is_serial": is_serial
         })
     return cols
 
 
-def get_primary_key(pg, schema, table):
+def get_all_primary_keys(pg, schemas):
     pg.execute("""
-        SELECT kcu.column_name
+        SELECT tc.table_schema, tc.table_name, kcu.column_name
         FROM information_schema.table_constraints tc
         JOIN information_schema.key_column_usage kcu
           ON tc.constraint_name = kcu.constraint_name
         WHERE tc.constraint_type='PRIMARY KEY'
-          AND tc.table_schema=%s
-          AND tc.table_name=%s
-        ORDER BY kcu.ordinal_position
-    """, (schema, table))
-    return [r[0] for r in pg.fetchall()]
+          AND tc.table_schema = ANY(%s)
+        ORDER BY tc.table_schema, tc.table_name, kcu.ordinal_position
+    """, (schemas,))
 
+    pks = {}
+    for schema, table, column in pg.fetchall():
+        pks.setdefault((schema, table), []).append(column)
+    return pks
 
-def get_indexes(pg, schema, table):
+
+def get_all_indexes(pg, schemas):
     pg.execute("""
         SELECT
+            idx.schemaname,
+            idx.tablename,
             idx.indexname,
             idx.indexdef
         FROM pg_indexes idx
-        WHERE schemaname=%s AND tablename=%s
-    """, (schema, table))
-    return pg.fetchall()
+        WHERE idx.schemaname = ANY(%s)
+    """, (schemas,))
 
+    indexes = {}
+    for schema, table, name, idxdef in pg.fetchall():
+        indexes.setdefault((schema, table), []).append((name, idxdef))
+    return indexes
 
-def get_foreign_keys(pg, schema, table):
+
+def get_all_foreign_keys(pg, schemas):
     pg.execute("""
         SELECT
+            tc.table_schema,
+            tc.table_name,
             tc.constraint_name,
             kcu.column_name,
             ccu.table_schema AS foreign_table_schema,
@@ -188,34 +251,152 @@ def get_foreign_keys(pg, schema, table):
         JOIN information_schema.constraint_column_usage AS ccu
              ON ccu.constraint_name = tc.constraint_name
         WHERE tc.constraint_type = 'FOREIGN KEY'
-          AND tc.table_schema=%s
-          AND tc.table_name=%s
-    """, (schema, table))
-    return pg.fetchall()
+          AND tc.table_schema = ANY(%s)
+    """, (schemas,))
+
+    fks = {}
+    for row in pg.fetchall():
+        fks.setdefault((row[0], row[1]), []).append(tuple(row[2:]))
+    return fks
+
+
+def get_metadata(pg, schemas):
+    """All table metadata for the target schemas in four queries total."""
+    return {
+        "columns": get_all_columns(pg, schemas),
+        "pks": get_all_primary_keys(pg, schemas),
+        "indexes": get_all_indexes(pg, schemas),
+        "fks": get_all_foreign_keys(pg, schemas),
+    }
+
+
+# -------------------------------------------------------------
+#  METADATA CACHE
+# -------------------------------------------------------------
+META_CACHE_PATH = os.path.join(EXPORT_DIR, ".meta_cache.pkl")
+
+
+def schema_fingerprint(pg):
+    """Cheap hash over the catalog rows of the target schemas.
+
+    xmin changes whenever a catalog row is updated by DDL. Hashing
+    pg_class alone is not enough: CREATE/DROP INDEX only touches the
+    index's own row (hence relkind 'i'), and RENAME COLUMN,
+    SET/DROP NOT NULL and SET/DROP DEFAULT only write pg_attribute /
+    pg_attrdef, so those row sets are hashed too.
+    """
+    pg.execute("""
+        SELECT md5(
+            COALESCE((
+                SELECT string_agg(c.oid::text || ':' || c.relnatts || ':' || c.xmin::text,
+                                  ',' ORDER BY c.oid)
+                FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = ANY(%s)
+                  AND c.relkind IN ('r', 'i')
+            ), '')
+            || '|' ||
+            COALESCE((
+                SELECT string_agg(a.attrelid::text || ':' || a.attname || ':' ||
+                                  a.attnotnull::text || ':' || a.atthasdef::text || ':' ||
+                                  a.xmin::text,
+                                  ',' ORDER BY a.attrelid, a.attnum)
+                FROM pg_attribute a
+                JOIN pg_class c ON c.oid = a.attrelid
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = ANY(%s)
+                  AND c.relkind = 'r'
+                  AND a.attnum > 0
+                  AND NOT a.attisdropped
+            ), '')
+            || '|' ||
+            COALESCE((
+                SELECT string_agg(d.adrelid::text || ':' || d.adnum::text || ':' ||
+                                  d.xmin::text,
+                                  ',' ORDER BY d.adrelid, d.adnum)
+                FROM pg_attrdef d
+                JOIN pg_class c ON c.oid = d.adrelid
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = ANY(%s)
+            ), '')
+        )
+    """, (SCHEMAS, SCHEMAS, SCHEMAS))
+    return pg.fetchone()[0]
+
+
+def cache_key(fingerprint):
+    return (PG["host"], PG["database"], tuple(SCHEMAS), fingerprint)
+
+
+def load_meta_cache(fingerprint):
+    try:
+        with open(META_CACHE_PATH, "rb") as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError):
+        return None
+
+    if cached.get("key") != cache_key(fingerprint):
+        return None
+
+    logging.info("Using cached schema metadata")
+    return cached
+
+
+def save_meta_cache(fingerprint, tables, meta):
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    with open(META_CACHE_PATH, "wb") as f:
+        pickle.dump({"key": cache_key(fingerprint), "tables": tables, "meta": meta}, f)
 
 
 # -------------------------------------------------------------
 #  CREATE TABLE
 # -------------------------------------------------------------
-def create_table(sql, schema, table, columns, pk):
-    sql.execute(f"IF NOT EXISTS (SELECT 1 FROM sys.schemas WHERE name='{schema}') EXEC('CREATE SCHEMA [{schema}]');")
+_COL_DEFS_CACHE = {}
 
-    col_defs = []
-    for c in columns:
-        sql_type = map_pg_type(c["data_type"], c["length"], c["precision"], c["scale"], c["is_serial"])
-        null_str = "NULL" if c["nullable"] and not c["is_serial"] else "NOT NULL"
-        col_defs.append(f"[{c['name']}] {sql_type} {null_str}")
 
-    pk_clause = ""
-    if pk:
-        pk_cols = ", ".join(f"[{c}]" for c in pk)
-        pk_clause = f", CONSTRAINT [PK_{schema}_{table}] PRIMARY KEY ({pk_cols})"
+def column_defs(columns):
+    """Rendered column-definition list, cached by column shape.
 
+    App schemas repeat the same shapes a lot (audit columns, lookup
+    tables), so identical shapes render once.
+    """
+    shape_key = tuple(
+        (c["name"], c["data_type"], c["length"], c["precision"], c["scale"],
+         c["nullable"], c["is_serial"])
+        for c in columns
+    )
+
+    cached = _COL_DEFS_CACHE.get(shape_key)
+    if cached is None:
+        col_defs = []
+        for c in columns:
+            sql_type = map_pg_type(c["data_type"], c["length"], c["precision"], c["scale"], c["is_serial"])
+            null_str = "NULL" if c["nullable"] and not c["is_serial"] else "NOT NULL"
+            col_defs.append(f"[{c['name']}] {sql_type} {null_str}")
+        cached = ", ".join(col_defs)
+        _COL_DEFS_CACHE[shape_key] = cached
+    return cached
+
+
+def create_schemas(sql, schemas):
+    """Create target schemas up front on one session.
+
+    The IF NOT EXISTS check-then-create is not atomic, so running it per
+    table inside the parallel DDL phase loses the race as soon as two
+    workers start on tables of the same schema.
+    """
+    for schema in sorted(schemas):
+        logging.info(f"Creating schema {schema}")
+        sql.execute(f"IF NOT EXISTS (SELECT 1 FROM sys.schemas WHERE name='{schema}') EXEC('CREATE SCHEMA [{schema}]');")
+
+
+def create_table(sql, schema, table, columns):
+    # No PK here on purpose: loading into an unindexed heap skips
+    # per-row B-tree maintenance; the PK is added after copy_data.
     create_sql = f"""
         IF OBJECT_ID('{schema}.{table}', 'U') IS NULL
         CREATE TABLE [{schema}].[{table}] (
-            {", ".join(col_defs)}
-            {pk_clause}
+            {column_defs(columns)}
         );
     """
 
@@ -223,9 +404,26 @@ def create_table(sql, schema, table, columns, pk):
     sql.execute(create_sql)
 
 
+def add_primary_key(sql, schema, table, pk):
+    if not pk:
+        return
+
+    pk_cols = ", ".join(f"[{c}]" for c in pk)
+    logging.info(f"Adding PK on {schema}.{table}")
+    sql.execute(f"""
+        IF OBJECT_ID('PK_{schema}_{table}', 'PK') IS NULL
+        ALTER TABLE [{schema}].[{table}]
+        ADD CONSTRAINT [PK_{schema}_{table}] PRIMARY KEY ({pk_cols});
+    """)
+
+
 # -------------------------------------------------------------
 #  INDEX MIGRATION
 # -------------------------------------------------------------
+# Column list of a pg_indexes indexdef, e.g. CREATE INDEX ... ON t ("a", b)
+_IDX_COLS_RE = re.compile(r"\(([^)]*)\)")
+
+
 def create_indexes(sql, schema, table, indexes):
     for name, idxdef in indexes:
         if "unique" in idxdef.lower():
@@ -234,9 +432,11 @@ def create_indexes(sql, schema, table, indexes):
             unique = ""
 
         # Extract column list
-        start = idxdef.index("(") + 1
-        end = idxdef.index(")")
-        cols = idxdef[start:end].replace('"', "").split(",")
+        match = _IDX_COLS_RE.search(idxdef)
+        if not match:
+            logging.warning(f"Skipping index {name}: cannot parse {idxdef}")
+            continue
+        cols = match.group(1).replace('"', "").split(",")
 
         col_list = ", ".join(f"[{c.strip()}]" for c in cols)
         index_name = f"IX_{schema}_{table}_{name}"
@@ -272,57 +472,492 @@ def create_foreign_keys(sql, schema, table, fks):
 # -------------------------------------------------------------
 #  DATA COPY
 # -------------------------------------------------------------
-def copy_data(pg, sql, schema, table, columns):
+_INPUT_SIZES = {
+    "INT": (pyodbc.SQL_INTEGER, 0, 0),
+    "INT IDENTITY(1,1)": (pyodbc.SQL_INTEGER, 0, 0),
+    "BIGINT": (pyodbc.SQL_BIGINT, 0, 0),
+    "SMALLINT": (pyodbc.SQL_SMALLINT, 0, 0),
+    "BIT": (pyodbc.SQL_BIT, 0, 0),
+    "DATE": (pyodbc.SQL_TYPE_DATE, 0, 0),
+    "DATETIME2": (pyodbc.SQL_TYPE_TIMESTAMP, 27, 7),
+    "FLOAT": (pyodbc.SQL_DOUBLE, 0, 0),
+    "REAL": (pyodbc.SQL_REAL, 0, 0),
+}
+
+
+def input_sizes(columns):
+    """ODBC bind descriptions per column, so the driver doesn't have to
+    re-infer parameter types from the data on every batch."""
+    sizes = []
+    for c in columns:
+        sql_type = map_pg_type(c["data_type"], c["length"], c["precision"], c["scale"], c["is_serial"])
+        if sql_type.startswith("NVARCHAR"):
+            # length 0 = NVARCHAR(MAX), driver switches to streaming.
+            sizes.append((pyodbc.SQL_WVARCHAR, c["length"] or 0, 0))
+        elif sql_type.startswith("DECIMAL"):
+            sizes.append((pyodbc.SQL_DECIMAL, c["precision"] or 18, c["scale"] or 4))
+        else:
+            sizes.append(_INPUT_SIZES.get(sql_type, (pyodbc.SQL_WVARCHAR, 0, 0)))
+    return sizes
+
+
+def pg_select(schema, table, col_names):
+    """Safely-quoted SELECT over the source table (psycopg2.sql, so odd
+    identifiers can't break or inject into the query text)."""
+    return pgsql.SQL("SELECT {} FROM {}").format(
+        pgsql.SQL(", ").join(pgsql.Identifier(c) for c in col_names),
+        pgsql.Identifier(schema, table),
+    )
+
+
+def spool_select(schema, table, columns):
+    """SELECT list for file-based loads, casting types SQL Server's bulk
+    loaders can't convert from COPY's text forms: booleans (t/f is not a
+    valid BIT) become int, timestamptz (the +00 offset suffix is not
+    valid DATETIME2) becomes a UTC-naive timestamp.
+    """
+    exprs = []
+    for c in columns:
+        ident = pgsql.Identifier(c["name"])
+        data_type = c["data_type"].lower()
+        if data_type == "boolean":
+            exprs.append(pgsql.SQL("{}::int").format(ident))
+        elif data_type == "timestamp with time zone":
+            exprs.append(pgsql.SQL("({} AT TIME ZONE 'UTC')").format(ident))
+        else:
+            exprs.append(ident)
+    return pgsql.SQL("SELECT {} FROM {}").format(
+        pgsql.SQL(", ").join(exprs), pgsql.Identifier(schema, table))
+
+
+def spool_csv(pg, schema, table, columns, delimiter=","):
+    """COPY the table out of PostgreSQL into a CSV under EXPORT_DIR."""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    csv_path = os.path.abspath(os.path.join(EXPORT_DIR, f"{schema}_{table}.csv"))
+
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        pg.copy_expert(
+            pgsql.SQL("COPY ({}) TO STDOUT WITH (FORMAT csv, DELIMITER {})").format(
+                spool_select(schema, table, columns), pgsql.Literal(delimiter)), f)
+
+    return csv_path
+
+
+def bulk_copy_csv(pg, sql, schema, table, columns, total, keep_identity=False):
+    """Spool the table to a CSV and load it with SQL Server BULK INSERT.
+
+    Bypasses the ODBC round-trip entirely; only usable when the CSV path
+    is readable from the SQL Server host (e.g. local or shared storage).
+    """
+    csv_path = spool_csv(pg, schema, table, columns)
+    logging.info(f"Bulk copying {total} rows from {schema}.{table} via {csv_path}")
+
+    try:
+        keep = ", KEEPIDENTITY" if keep_identity else ""
+        sql.execute(f"""
+            BULK INSERT [{schema}].[{table}]
+            FROM '{csv_path}'
+            WITH (FORMAT='CSV', TABLOCK{keep});
+        """)
+    finally:
+        os.remove(csv_path)
+
+    logging.info(f"  Bulk copied {total}/{total}")
+
+
+def text_free(columns):
+    """True when no column maps to a character type.
+
+    bcp -c does no CSV unquoting, and COPY (FORMAT csv) quotes any field
+    containing a quote, CR or LF — so the bcp path is only safe when the
+    table has no text data that could trigger quoting.
+    """
+    return not any(
+        map_pg_type(c["data_type"], c["length"], c["precision"], c["scale"], c["is_serial"]).startswith("NVARCHAR")
+        for c in columns
+    )
+
+
+def bulk_copy_bcp(pg, schema, table, columns, total, keep_identity=False):
+    """Spool the table to a flat file and load it with the bcp utility.
+
+    Unlike BULK INSERT, bcp reads the file client-side, so it works when
+    the SQL Server host cannot see our filesystem. Only used for tables
+    that pass text_free(): bcp -c does no CSV unquoting, so quoted text
+    fields would be loaded verbatim and embedded newlines would
+    misalign rows.
+    """
+    csv_path = spool_csv(pg, schema, table, columns, delimiter="\x1f")
+    logging.info(f"Bulk copying {total} rows from {schema}.{table} via bcp")
+
+    try:
+        cmd = [
+            "bcp", f"{SQL['database']}.{schema}.{table}", "in", csv_path,
+            "-S", SQL["server"],
+            "-U", SQL["uid"],
+            "-P", SQL["pwd"],
+            "-c", "-t", "\x1f",
+            "-b", "50000",
+        ]
+        if keep_identity:
+            cmd.append("-E")
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"bcp failed for {schema}.{table}: {result.stdout}\n{result.stderr}")
+    finally:
+        os.remove(csv_path)
+
+    logging.info(f"  Bulk copied {total}/{total}")
+
+
+def stream_copy(pgc, sql, schema, table, columns, select_sql, insert_sql, cursor_name, total, select_params=None, identity_insert=False):
+    """Stream select_sql through a named cursor into insert_sql batches.
+
+    Producer/consumer: a reader thread keeps the PG socket busy while
+    the caller's thread pushes batches to SQL Server. maxsize bounds the
+    in-flight memory to two batches.
+    """
+    # Array-bound parameters: one round-trip per batch instead of per row.
+    # setinputsizes locks the bind types up front so the statement is
+    # prepared once per table, not re-inferred per batch.
+    sql.fast_executemany = True
+    sql.setinputsizes(input_sizes(columns))
+
+    pg_read = pgc.cursor(name=cursor_name, withhold=True)
+    pg_read.itersize = BATCH_SIZE
+    # Matching arraysize lets fetchmany default to one full batch and
+    # sizes the client-side row buffer once instead of growing it.
+    pg_read.arraysize = BATCH_SIZE
+
+    batches = queue.Queue(maxsize=2)
+    read_error = []
+    stop = threading.Event()
+
+    def reader():
+        try:
+            pg_read.execute(select_sql, select_params)
+            while not stop.is_set():
+                batch = pg_read.fetchmany(BATCH_SIZE)
+                if not batch:
+                    break
+                # Re-check stop while the queue is full, so a failed
+                # writer can't leave us blocked on put() forever.
+                while not stop.is_set():
+                    try:
+                        batches.put(batch, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+        except Exception as e:
+            read_error.append(e)
+        finally:
+            # The sentinel must arrive: with a slow writer the queue is
+            # usually full right now, and dropping it would leave the
+            # writer blocked in get() forever. Only give up once the
+            # writer has signalled it stopped consuming.
+            while True:
+                try:
+                    batches.put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    if stop.is_set():
+                        break
+
+    reader_thread = threading.Thread(target=reader, daemon=True)
+    reader_thread.start()
+
+    # IDENTITY_INSERT is per-session, so each copy session (including
+    # key-range workers) toggles it on its own connection.
+    if identity_insert:
+        sql.execute(f"SET IDENTITY_INSERT [{schema}].[{table}] ON")
+
+    try:
+        copied = 0
+        last_log = time.monotonic()
+        while True:
+            batch = batches.get()
+            if batch is None:
+                break
+            sql.executemany(insert_sql, batch)
+            copied += len(batch)
+            # At most one progress line per second; a 100M-row table
+            # would otherwise serialize on the logging lock per batch.
+            now = time.monotonic()
+            if now - last_log > 1.0:
+                logging.info(f"  Copied {copied}/{total} into {schema}.{table}")
+                last_log = now
+
+        logging.info(f"  Copied {copied}/{total} into {schema}.{table}")
+        reader_thread.join()
+        if read_error:
+            raise read_error[0]
+    finally:
+        stop.set()
+        reader_thread.join()
+        if identity_insert:
+            # Must not mask an executemany error with its own failure;
+            # the transaction is rolled back by the caller anyway.
+            try:
+                sql.execute(f"SET IDENTITY_INSERT [{schema}].[{table}] OFF")
+            except pyodbc.Error:
+                logging.warning(f"Could not reset IDENTITY_INSERT on {schema}.{table}")
+        pg_read.close()
+
+    return copied
+
+
+def int_pk_column(columns, pk):
+    """The PK column name if it is a single integer column, else None."""
+    if len(pk) != 1:
+        return None
+    for c in columns:
+        if c["name"] == pk[0] and c["data_type"].lower() in ("smallint", "integer", "bigint", "int2", "int4", "int8"):
+            return c["name"]
+    return None
+
+
+def copy_range(args):
+    schema, table, columns, col_names, sql_cols, placeholders, pk_col, lo, hi, total, identity_insert = args
+
+    select_sql = pgsql.SQL("{} WHERE {} >= %s AND {} < %s").format(
+        pg_select(schema, table, col_names),
+        pgsql.Identifier(pk_col),
+        pgsql.Identifier(pk_col),
+    )
+    # TABLOCK lets SQL Server take bulk-update locks so parallel
+    # sessions can load the same heap without blocking each other.
+    insert_sql = f"INSERT INTO [{schema}].[{table}] WITH (TABLOCK) ({sql_cols}) VALUES ({placeholders})"
+
+    # A dedicated connection, not a thread-local one: each partitioned
+    # table spins up a fresh executor, so thread-local connections on
+    # its short-lived threads would never be closed. pyodbc pooling
+    # makes open/close a cheap handle checkout.
+    sqlc = sql_conn()
+    sql = sqlc.cursor()
+    try:
+        with pooled_pg_conn() as pgc:
+            copied = stream_copy(pgc, sql, schema, table, columns,
+                                 select_sql, insert_sql,
+                                 f"mig_{schema}_{table}_{lo}", total,
+                                 select_params=(lo, hi),
+                                 identity_insert=identity_insert)
+        sqlc.commit()
+        return copied
+    except Exception:
+        sqlc.rollback()
+        raise
+    finally:
+        sql.close()
+        sqlc.close()
+
+
+def copy_data_partitioned(pgc, schema, table, columns, col_names, sql_cols, placeholders, pk_col, total, identity_insert=False):
+    pg = pgc.cursor()
+    try:
+        pg.execute(pgsql.SQL("SELECT MIN({}), MAX({}) FROM {}").format(
+            pgsql.Identifier(pk_col), pgsql.Identifier(pk_col),
+            pgsql.Identifier(schema, table)))
+        lo, hi = pg.fetchone()
+    finally:
+        pg.close()
+
+    chunks = min(PARTITION_WORKERS, total)
+    step = max(1, (hi - lo + 1 + chunks - 1) // chunks)
+    ranges = []
+    start = lo
+    while start <= hi:
+        ranges.append((schema, table, columns, col_names, sql_cols, placeholders,
+                       pk_col, start, start + step, total, identity_insert))
+        start += step
+
+    logging.info(f"Copying {total} rows from {schema}.{table} in {len(ranges)} key ranges")
+
+    with ThreadPoolExecutor(max_workers=chunks) as executor:
+        copied = sum(executor.map(copy_range, ranges))
+
+    logging.info(f"  Copied {copied}/{total} into {schema}.{table} (partitioned)")
+
+
+def copy_data(pgc, sql, schema, table, columns, pk=None):
+    has_serial = any(c["is_serial"] for c in columns)
+
+    # Plain cursor for COUNT and COPY; the data SELECT gets its own
+    # named (server-side) cursor so rows stream in fixed chunks
+    # instead of being buffered client-side.
+    pg = pgc.cursor()
+
+    try:
+        pg.execute(pgsql.SQL("SELECT COUNT(*) FROM {}").format(
+            pgsql.Identifier(schema, table)))
+        total = pg.fetchone()[0]
+
+        if total > BULK_INSERT_THRESHOLD:
+            # File loads map columns by position, so they always ship
+            # every column and keep source IDENTITY values.
+            try:
+                if shutil.which("bcp") and text_free(columns):
+                    bulk_copy_bcp(pg, schema, table, columns, total, has_serial)
+                else:
+                    bulk_copy_csv(pg, sql, schema, table, columns, total, has_serial)
+                return
+            except (pyodbc.Error, RuntimeError):
+                # Typically the SQL Server host can't read EXPORT_DIR.
+                # The streaming path below is slower but always works.
+                sql.connection.rollback()
+                logging.warning(f"File-based bulk load failed for {schema}.{table}; "
+                                "falling back to streaming inserts", exc_info=True)
+    finally:
+        pg.close()
+
+    if has_serial and not PRESERVE_IDENTITY:
+        # Let SQL Server regenerate IDENTITY values: fewer bytes on the
+        # wire, but source IDs (and anything referencing them) change.
+        columns = [c for c in columns if not c["is_serial"]]
+        has_serial = False
+
+    identity_insert = has_serial
+
     col_names = [c["name"] for c in columns]
-    pg_cols = ", ".join(f'"{c}"' for c in col_names)
     sql_cols = ", ".join(f"[{c}]" for c in col_names)
     placeholders = ", ".join("?" for _ in col_names)
 
-    pg.execute(f'SELECT COUNT(*) FROM "{schema}"."{table}"')
-    total = pg.fetchone()[0]
-    logging.info(f"Copying {total} rows from {schema}.{table}")
+    pk_col = int_pk_column(columns, pk or [])
+    if pk_col and total > PARTITION_THRESHOLD:
+        copy_data_partitioned(pgc, schema, table, columns, col_names, sql_cols,
+                              placeholders, pk_col, total, identity_insert)
+        return
 
-    pg.execute(f'SELECT {pg_cols} FROM "{schema}"."{table}"')
+    logging.info(f"Copying {total} rows from {schema}.{table}")
 
-    copied = 0
-    while True:
-        batch = pg.fetchmany(BATCH_SIZE)
-        if not batch:
-            break
-        sql.executemany(f"INSERT INTO [{schema}].[{table}] ({sql_cols}) VALUES ({placeholders})", batch)
-        copied += len(batch)
-        logging.info(f"  Copied {copied}/{total}")
+    stream_copy(pgc, sql, schema, table, columns,
+                pg_select(schema, table, col_names),
+                f"INSERT INTO [{schema}].[{table}] ({sql_cols}) VALUES ({placeholders})",
+                f"mig_{schema}_{table}", total,
+                identity_insert=identity_insert)
 
 
 # -------------------------------------------------------------
-# MAIN
+#  WORKER THREADS
 # -------------------------------------------------------------
-def migrate():
-    logging.info("Starting Migration...")
+_local = threading.local()
 
-    pgc = pg_conn()
-    pg = pgc.cursor()
 
-    sqlc = sql_conn()
-    sql = sqlc.cursor()
+def thread_sql_conn():
+    """Lazy per-thread SQL Server connection, so workers never share a cursor."""
+    if not hasattr(_local, "sqlc"):
+        _local.sqlc = sql_conn()
+    return _local.sqlc
+
+
+def table_task(fn):
+    """Wrap a per-table phase function with cursor/commit handling."""
+    def task(item, meta):
+        schema, table = item
+        sqlc = thread_sql_conn()
+        sql = sqlc.cursor()
+        try:
+            fn(sql, schema, table, meta)
+            sqlc.commit()
+        except Exception:
+            sqlc.rollback()
+            raise
+        finally:
+            sql.close()
+    return task
 
-    tables = get_tables(pg)
 
-    for schema, table in tables:
-        logging.info(f"Processing table: {schema}.{table}")
+@table_task
+def ddl_phase(sql, schema, table, meta):
+    create_table(sql, schema, table, meta["columns"].get((schema, table), []))
 
-        cols = get_columns(pg, schema, table)
-        pk = get_primary_key(pg, schema, table)
-        indexes = get_indexes(pg, schema, table)
-        fks = get_foreign_keys(pg, schema, table)
 
-        create_table(sql, schema, table, cols, pk)
-        copy_data(pg, sql, schema, table, cols)
-        create_indexes(sql, schema, table, indexes)
-        create_foreign_keys(sql, schema, table, fks)
+@table_task
+def data_phase(sql, schema, table, meta):
+    with pooled_pg_conn() as pgc:
+        copy_data(pgc, sql, schema, table,
+                  meta["columns"].get((schema, table), []),
+                  meta["pks"].get((schema, table), []))
+
+
+@table_task
+def constraint_phase(sql, schema, table, meta):
+    add_primary_key(sql, schema, table, meta["pks"].get((schema, table), []))
+    create_indexes(sql, schema, table, meta["indexes"].get((schema, table), []))
+
+
+@table_task
+def fk_phase(sql, schema, table, meta):
+    create_foreign_keys(sql, schema, table, meta["fks"].get((schema, table), []))
+
+
+def run_phase(name, fn, tables, meta, workers):
+    start = time.monotonic()
+    logging.info(f"Phase '{name}' starting ({len(tables)} tables, {workers} workers)")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # list() drains the map so the first failure propagates here,
+        # before the next phase is allowed to start.
+        list(executor.map(partial(fn, meta=meta), tables))
+
+    logging.info(f"Phase '{name}' finished in {time.monotonic() - start:.1f}s")
+
+
+# -------------------------------------------------------------
+# MAIN
+# -------------------------------------------------------------
+def migrate(workers=None):
+    logging.info("Starting Migration...")
+
+    # Worst case every table worker holds its own connection through
+    # data_phase while its key-range workers check out another each, and
+    # getconn raises PoolError rather than blocking when exhausted.
+    init_pg_pool(maxconn=(workers or 8) * (PARTITION_WORKERS + 1) + 1)
+
+    try:
+        with pooled_pg_conn() as pgc:
+            pg = pgc.cursor()
+            fingerprint = schema_fingerprint(pg)
+            cached = load_meta_cache(fingerprint)
+            if cached is not None:
+                tables, meta = cached["tables"], cached["meta"]
+            else:
+                tables = get_tables(pg)
+                meta = get_metadata(pg, SCHEMAS)
+                save_meta_cache(fingerprint, tables, meta)
+            pg.close()
+
+        if workers is None:
+            workers = min(8, max(1, len(tables)))
+
+        logging.info(f"Migrating {len(tables)} tables with {workers} workers")
+
+        # Schemas first, serially: the check-then-create race would
+        # abort the parallel DDL phase otherwise.
+        sqlc = sql_conn()
+        sql = sqlc.cursor()
+        try:
+            create_schemas(sql, {schema for schema, _ in tables})
+            sqlc.commit()
+        finally:
+            sql.close()
+            sqlc.close()
+
+        # pg_restore-style phases: all DDL lands (and fails fast) before
+        # any data moves, constraints build only on loaded tables, and
+        # FKs go last so every referenced PK already exists.
+        run_phase("create tables", ddl_phase, tables, meta, workers)
+        run_phase("copy data", data_phase, tables, meta, workers)
+        run_phase("pk + indexes", constraint_phase, tables, meta, workers)
+        run_phase("foreign keys", fk_phase, tables, meta, workers)
+    finally:
+        PG_POOL.closeall()
 
     logging.info("Migration completed successfully!")
 
 
 if __name__ == "__main__":
-    migrate()
+    parser = argparse.ArgumentParser(description="PostgreSQL -> SQL Server migration tool")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of parallel table workers (default: min(8, table count))")
+    args = parser.parse_args()
+    migrate(workers=args.workers)